@@ -1,8 +1,8 @@
 import os
 import time
 import datetime as dt
-import requests
 import feedparser
+import replay
 
 FEISHU_WEBHOOK = (os.environ.get("FEISHU_WEBHOOK") or "").strip()
 DEEPSEEK_API_KEY = (os.environ.get("DEEPSEEK_API_KEY") or "").strip()
@@ -15,7 +15,7 @@ def post_to_feishu(text: str):
     if not FEISHU_WEBHOOK:
         raise RuntimeError("Missing FEISHU_WEBHOOK secret.")
     payload = {"msg_type": "text", "content": {"text": text}}
-    r = requests.post(FEISHU_WEBHOOK, json=payload, timeout=20)
+    r = replay.http_post(FEISHU_WEBHOOK, json=payload, timeout=20)
     r.raise_for_status()
 
 
@@ -43,7 +43,8 @@ def post_to_feishu_in_chunks(text: str, max_len: int = 3500):
 # -------------------------
 def read_feed(url: str, limit: int = 12):
     try:
-        d = feedparser.parse(url)
+        r = replay.http_get(url, timeout=20)
+        d = feedparser.parse(r.content)
         items = []
         for e in d.entries[:limit]:
             title = (e.get("title") or "").strip()
@@ -168,7 +169,7 @@ def call_deepseek(material_text: str, date_str: str) -> str:
     headers = {"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"}
     payload = {"model": "deepseek-chat", "messages": [{"role": "user", "content": prompt}], "temperature": 0.2}
 
-    r = requests.post(url, headers=headers, json=payload, timeout=80)
+    r = replay.http_post(url, headers=headers, json=payload, timeout=80)
     print("DeepSeek status:", r.status_code)
     if r.status_code != 200:
         return "（DeepSeek调用失败，已降级为原始素材）\n\n" + material_text
@@ -179,10 +180,10 @@ def call_deepseek(material_text: str, date_str: str) -> str:
 # Main
 # -------------------------
 def main():
-    now_ts = int(time.time())
+    now_ts = replay.now_ts()
     DAY = 24 * 3600
 
-    beijing_now = dt.datetime.utcnow() + dt.timedelta(hours=8)
+    beijing_now = dt.datetime.utcfromtimestamp(now_ts) + dt.timedelta(hours=8)
     date_str = beijing_now.strftime("%Y-%m-%d")
     title = f"AI创业日报（北京 {beijing_now.strftime('%Y-%m-%d %H:%M')}）"
 
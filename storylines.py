@@ -0,0 +1,340 @@
+"""
+跨天故事线索引：同一件事（政策发布→解读→落地）每天都会冒出新标题，
+周报里逐条喂给模型既浪费 token 又挤掉别的新闻。
+
+这里把每条新标题增量归入已有故事线（或新开一条），每条故事线只保留紧凑状态：
+首见/最新时间、累计条数、首条与最新标题、标题字词签名。每次运行只处理新条目，
+状态存成 JSON，供下次运行继续累积；素材里每条故事线只占一行，只统计本次窗口内的条目。
+
+相似度：先去掉“发布/政策/措施/通知”等套话，剩下的主题词中文按字二元组、英文/数字按整词切分，
+用索引内文档频率做 idf 加权，与故事线首条/最新标题算加权 Jaccard。
+“成都市发布支持X产业发展若干政策措施”这类模板标题只在中间换了主题词、其余几乎全是套话，
+达到阈值后再单独否决；“今日开幕/昨日闭幕”“一期/二期投运”这类同一事件的进展不受影响。
+候选只从倒排表里的低频词元取（“成都/AI”这种几乎每条都有的词不拉候选），每条新标题只和少数故事线比较。
+"""
+import os
+import json
+import math
+import re
+import difflib
+import datetime as dt
+from urllib.parse import urlparse
+
+import replay
+
+MATCH_THRESHOLD = 0.3
+MIN_SHARED_GRAMS = 3
+# 出现在超过这个比例故事线里的词元不用来找候选（至少放行 CANDIDATE_MIN_DF 条，小索引时不受影响）
+CANDIDATE_MAX_DF_SHARE = 0.05
+CANDIDATE_MIN_DF = 8
+# 模板否决：其余部分的主题权重不超过被替换主题的这么多倍，才算“其余几乎全是套话”
+SWAP_REST_RATIO = 3.0
+SIGNATURE_MAX_GRAMS = 80
+RETENTION_SEC = 30 * 24 * 3600
+
+# 故事线状态目录；置空则只在内存里聚合。回放时只用归档里的状态快照，不读写这里
+STATE_DIR = os.environ.get("STORYLINE_STATE_DIR", ".state").strip()
+
+# 政策/统计类标题的套话及进展阶段词：不参与匹配，否则同一模板的不同新闻会被并成一条
+BOILERPLATE_WORDS = [
+    "发布", "印发", "出台", "公布", "宣布", "支持", "扶持", "促进", "推动", "加快",
+    "若干", "政策", "措施", "通知", "意见", "方案", "办法", "实施", "行动", "关于",
+    "产业", "发展", "解读", "落实", "落地", "召开", "举行", "会议", "首批",
+    "同比", "环比", "上涨", "下降", "增长",
+    # 时间/进展阶段词：同一事件逐日更新时变化的正是这些
+    "今日", "昨日", "明日", "今天", "昨天", "明天", "正式", "开幕", "闭幕", "启动", "开启", "截止",
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[一-鿿]+")
+_BOILERPLATE_RE = re.compile("|".join(sorted(BOILERPLATE_WORDS, key=len, reverse=True)))
+_SEQ_TOKEN_RE = re.compile(r"[a-z0-9]+|[一-鿿]")
+
+
+def _strip_source(title: str) -> str:
+    # Google News 标题末尾带“ - 媒体名”，不去掉的话同一媒体的标题都会互相匹配
+    head, sep, tail = title.rpartition(" - ")
+    if sep and head and len(tail) <= 20:
+        return head
+    return title
+
+
+def title_grams(title: str):
+    """
+    主题词元：套话替换成分隔符后再切，避免“区发/策通”这类跨套话的二元组
+    """
+    grams = set()
+    text = _BOILERPLATE_RE.sub(" ", _strip_source(title).lower())
+    for tok in _TOKEN_RE.findall(text):
+        if tok[0].isascii():
+            grams.add(tok)
+        elif len(tok) == 1:
+            grams.add(tok)
+        else:
+            grams.update(tok[i:i + 2] for i in range(len(tok) - 1))
+    return grams
+
+
+def _topic_grams(text: str):
+    # 单个汉字（今/昨、一/二）不算主题
+    return {g for g in title_grams(text) if len(g) >= 2}
+
+
+def _seq_tokens(title: str):
+    # 英文/数字整词、汉字逐字：CPI/PPI 这种缩写整体参与比对
+    return _SEQ_TOKEN_RE.findall(_strip_source(title).lower())
+
+
+def _item_key(it) -> str:
+    # 与 dedup 保持一致：按标题前 80 字去重
+    return (it.get("title") or "")[:80]
+
+
+def _domain(url: str) -> str:
+    try:
+        if not url:
+            return "unknown"
+        return urlparse(url).netloc or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def _fmt_day(ts: int, fmt: str = "%m-%d") -> str:
+    return dt.datetime.utcfromtimestamp(ts).strftime(fmt)
+
+
+class StorylineIndex:
+    def __init__(self, state=None):
+        self.next_id = 1
+        self.stories = {}   # id -> {first_ts, last_ts, count, first_title, latest_title, source, grams}
+        self.seen = {}      # item key -> story id
+        self.df = {}        # gram -> 含该词元的故事线数
+        self.postings = {}  # gram -> {story id}
+        self.rep_grams = {}  # story id -> (首条标题词元, 最新标题词元)，不落盘，加载时重建
+        self.window = {}    # 本次运行命中的 story id -> 窗口内的 {count, first_ts, first_title, last_ts, latest_title, source}
+        if state:
+            self.next_id = state.get("next_id", 1)
+            self.seen = state.get("seen", {})
+            for sid, st in state.get("stories", {}).items():
+                self._insert(sid, st)
+
+    # -------------------------
+    # State
+    # -------------------------
+    def to_state(self):
+        return {"next_id": self.next_id, "stories": self.stories, "seen": self.seen}
+
+    def _insert(self, sid: str, st):
+        self.stories[sid] = st
+        self._cache_rep_grams(sid)
+        for g in st["grams"]:
+            self.df[g] = self.df.get(g, 0) + 1
+            self.postings.setdefault(g, set()).add(sid)
+
+    def _cache_rep_grams(self, sid: str):
+        st = self.stories[sid]
+        first = title_grams(st["first_title"])
+        latest = first if st["latest_title"] == st["first_title"] else title_grams(st["latest_title"])
+        self.rep_grams[sid] = (first, latest)
+
+    def _extend_signature(self, sid: str, grams):
+        st = self.stories[sid]
+        sig = set(st["grams"])
+        for g in sorted(grams - sig):
+            if len(st["grams"]) >= SIGNATURE_MAX_GRAMS:
+                break
+            st["grams"].append(g)
+            self.df[g] = self.df.get(g, 0) + 1
+            self.postings.setdefault(g, set()).add(sid)
+
+    def prune(self, now_ts: int, retention_sec: int = RETENTION_SEC):
+        expired = [sid for sid, st in self.stories.items() if now_ts - st["last_ts"] > retention_sec]
+        for sid in expired:
+            self.rep_grams.pop(sid, None)
+            for g in self.stories.pop(sid)["grams"]:
+                self.df[g] -= 1
+                self.postings[g].discard(sid)
+                if self.df[g] <= 0:
+                    del self.df[g]
+                    del self.postings[g]
+        if expired:
+            gone = set(expired)
+            self.seen = {k: sid for k, sid in self.seen.items() if sid not in gone}
+
+    # -------------------------
+    # Assign
+    # -------------------------
+    def _idf(self, g: str) -> float:
+        return math.log((len(self.stories) + 1) / (self.df.get(g, 0) + 1)) + 1.0
+
+    def _weight(self, grams) -> float:
+        return sum(self._idf(g) for g in grams)
+
+    def _similarity(self, grams, weights, rep) -> float:
+        shared = grams & rep
+        if len(shared) < MIN_SHARED_GRAMS:
+            return 0.0
+        shared_w = sum(weights[g] for g in shared)
+        return shared_w / (sum(weights.values()) + self._weight(rep - grams))
+
+    def _is_template_swap(self, a: str, b: str) -> bool:
+        """
+        中间某段被替换、两边都是实在的主题词，而其余部分几乎全是套话：同一模板换了主题，不是同一事件
+        """
+        ta, tb = _seq_tokens(a), _seq_tokens(b)
+        ops = difflib.SequenceMatcher(None, ta, tb, autojunk=False).get_opcodes()
+        rest_w = self._weight(_topic_grams(" ".join(
+            "".join(ta[i1:i2]) for tag, i1, i2, _, _ in ops if tag == "equal"
+        )))
+        for k, (tag, i1, i2, j1, j2) in enumerate(ops):
+            if tag != "replace" or k == 0 or k == len(ops) - 1:
+                continue
+            span_a, span_b = _topic_grams("".join(ta[i1:i2])), _topic_grams("".join(tb[j1:j2]))
+            if span_a and span_b and rest_w <= SWAP_REST_RATIO * min(self._weight(span_a), self._weight(span_b)):
+                return True
+        return False
+
+    def _candidates(self, grams):
+        max_df = max(CANDIDATE_MIN_DF, int(CANDIDATE_MAX_DF_SHARE * len(self.stories)))
+        candidates = set()
+        for g in grams:
+            posting = self.postings.get(g, ())
+            if len(posting) <= max_df:
+                candidates.update(posting)
+        return candidates
+
+    def _best_match(self, title: str, grams):
+        """
+        候选 = 倒排表里和新标题共享低频主题词元的故事线；与其首条/最新标题比加权 Jaccard，
+        过阈值的再做模板否决。按 id 顺序遍历、同分取先建的故事线，保证每次运行/回放归并结果一致
+        """
+        if not grams:
+            return None
+        weights = {g: self._idf(g) for g in grams}
+        scored = []
+        for sid in self._candidates(grams):
+            st = self.stories[sid]
+            for rep_title, rep in zip((st["first_title"], st["latest_title"]), self.rep_grams[sid]):
+                score = self._similarity(grams, weights, rep)
+                if score >= MATCH_THRESHOLD:
+                    scored.append((-score, int(sid), sid, rep_title))
+        for _, _, sid, rep_title in sorted(scored):
+            if not self._is_template_swap(title, rep_title):
+                return sid
+        return None
+
+    def add(self, items):
+        """
+        逐条归入故事线；已见过的条目只记命中，不重复计数
+        """
+        for it in items:
+            key = _item_key(it)
+            sid = self.seen.get(key)
+            if sid in self.stories:
+                self._hit(sid, it)
+                continue
+
+            title, ts = it["title"], it["published_ts"]
+            grams = title_grams(title)
+            sid = self._best_match(title, grams)
+            if sid is None:
+                sid = str(self.next_id)
+                self.next_id += 1
+                self._insert(sid, {
+                    "first_ts": ts, "last_ts": ts, "count": 0,
+                    "first_title": title, "latest_title": title,
+                    "source": _domain(it.get("link", "")), "grams": [],
+                })
+            st = self.stories[sid]
+            st["count"] += 1
+            if ts < st["first_ts"]:
+                st["first_ts"], st["first_title"] = ts, title
+            if ts >= st["last_ts"]:
+                st["last_ts"], st["latest_title"] = ts, title
+                st["source"] = _domain(it.get("link", ""))
+            self._cache_rep_grams(sid)
+            self._extend_signature(sid, grams)
+            self.seen[key] = sid
+            self._hit(sid, it)
+
+    def _hit(self, sid: str, it):
+        title, ts = it["title"], it["published_ts"]
+        w = self.window.get(sid)
+        if w is None:
+            w = self.window[sid] = {
+                "count": 0, "first_ts": ts, "first_title": title,
+                "last_ts": ts, "latest_title": title, "source": _domain(it.get("link", "")),
+            }
+        w["count"] += 1
+        if ts < w["first_ts"]:
+            w["first_ts"], w["first_title"] = ts, title
+        if ts > w["last_ts"]:
+            w["last_ts"], w["latest_title"] = ts, title
+            w["source"] = _domain(it.get("link", ""))
+
+    # -------------------------
+    # Material
+    # -------------------------
+    def active(self):
+        """
+        本次运行命中的故事线（窗口内条目 + 故事线首见时间）：窗口内条数多的在前，其次按最新时间
+        """
+        sids = sorted(self.window, key=lambda s: (-self.window[s]["count"], -self.window[s]["last_ts"], int(s)))
+        return [dict(self.window[s], since_ts=self.stories[s]["first_ts"]) for s in sids]
+
+
+def storyline_block(title: str, index: StorylineIndex, cap: int):
+    lines = [f""]
+    stories = index.active()
+    if not stories:
+        lines.append("（近7天内无符合条件条目）")
+        return "\n".join(lines)
+
+    # 关键：不提供URL，避免模型产出链接占位符
+    # 条数/日期只算窗口内；更早的历史只给一个“首见”日期
+    for i, st in enumerate(stories[:cap], 1):
+        since = f"｜首见:{_fmt_day(st['since_ts'], '%Y-%m-%d')}" if st["since_ts"] < st["first_ts"] else ""
+        if st["count"] == 1:
+            lines.append(f"{i}. {st['latest_title']} ｜来源:{st['source']}｜日期:{_fmt_day(st['last_ts'], '%Y-%m-%d')}{since}")
+            continue
+        line = f"{i}. {st['first_title']}"
+        if st["latest_title"] != st["first_title"]:
+            line += f" ｜最新进展:{st['latest_title']}"
+        line += f" ｜{st['count']}条｜{_fmt_day(st['first_ts'])}→{_fmt_day(st['last_ts'])}{since}｜来源:{st['source']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _read_state(path: str):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_state(path: str, state):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def build_storylines(items, name: str, now_ts: int):
+    path = os.path.join(STATE_DIR, f"{name}.json") if STATE_DIR else ""
+    if replay.is_replaying():
+        # 回放：用录制时的状态快照，不读也不覆盖本地 .state，保证 prompt 与录制时一致
+        raw = replay.load_state(f"storylines/{name}.json")
+        state = json.loads(raw) if raw else None
+    else:
+        state = _read_state(path)
+        if state is not None:
+            replay.save_state(f"storylines/{name}.json", json.dumps(state, ensure_ascii=False).encode("utf-8"))
+
+    index = StorylineIndex(state)
+    index.prune(now_ts)
+    index.add(items)
+    if not replay.is_replaying():
+        _write_state(path, index.to_state())
+    return index
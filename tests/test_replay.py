@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import replay  # noqa: E402
+
+FEED_URL = "https://news.google.com/rss/search?q=a"
+OTHER_FEED_URL = "https://news.google.com/rss/search?q=b"
+DEEPSEEK_URL = "https://api.deepseek.com/v1/chat/completions"
+FEISHU_URL = "https://open.feishu.cn/open-apis/bot/v2/hook/secret"
+
+
+def _fake_request(method, url, **kwargs):
+    r = requests.Response()
+    r.status_code = 200
+    r.headers["Content-Type"] = "text/plain; charset=utf-8"
+    r.encoding = "utf-8"
+    r.url = url
+    r._content = f"{method} {url} {kwargs.get('json')}".encode("utf-8")
+    return r
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    path = str(tmp_path / "run.zip")
+    monkeypatch.setattr(requests, "request", _fake_request)
+    recorder = replay._Recorder(path)
+    monkeypatch.setattr(replay, "_session", recorder)
+    feed = replay.http_get(FEED_URL, timeout=5).content
+    answer = replay.http_post(DEEPSEEK_URL, json={"prompt": "v1"}, timeout=5).content
+    replay.http_post(FEISHU_URL, json={"text": "chunk 1"}, timeout=5)
+
+    monkeypatch.setattr(requests, "request", None)  # 回放不许联网
+    monkeypatch.setattr(replay, "_session", replay._Replayer(path))
+    return recorder.started_ts, feed, answer
+
+
+def test_exact_match_and_pinned_clock(archive):
+    started_ts, feed, _ = archive
+    assert replay.http_get(FEED_URL).content == feed
+    assert replay.now_ts() == started_ts
+
+
+def test_changed_body_falls_back_to_same_url(archive, capsys):
+    _, _, answer = archive
+    assert replay.http_post(DEEPSEEK_URL, json={"prompt": "v2"}).content == answer
+    assert "diverged" in capsys.readouterr().out
+
+
+def test_feishu_posts_past_the_recording_get_fake_200(archive):
+    assert replay.http_post(FEISHU_URL, json={"text": "chunk 1"}).status_code == 200
+    r = replay.http_post(FEISHU_URL, json={"text": "chunk 2"})
+    assert r.status_code == 200
+    assert r.json()["code"] == 0
+
+
+def test_unrecorded_get_raises(archive):
+    with pytest.raises(requests.ConnectionError):
+        replay.http_get(OTHER_FEED_URL)
@@ -0,0 +1,102 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storylines import StorylineIndex, storyline_block, title_grams  # noqa: E402
+
+DAY = 24 * 3600
+NOW = 1_790_000_000
+
+
+def _items(*titles, start_ts=NOW - 6 * DAY):
+    return [
+        {"title": t, "link": f"https://s{i}.example.com/{i}", "published_ts": start_ts + i * DAY}
+        for i, t in enumerate(titles)
+    ]
+
+
+def _story_counts(index):
+    return sorted(w["count"] for w in index.window.values())
+
+
+def test_template_titles_stay_separate():
+    index = StorylineIndex()
+    index.add(_items(
+        "成都市发布支持人工智能产业发展若干政策措施",
+        "成都市发布支持低空经济产业发展若干政策措施",
+        "成都市发布支持生物医药产业发展若干政策措施",
+        "统计局：10月CPI同比上涨",
+        "统计局：10月PPI同比下降",
+        "成都高新区发布AI扶持政策通知",
+        "天府新区发布AI扶持政策通知",
+    ))
+    assert len(index.stories) == 7
+    block = storyline_block("", index, cap=20)
+    assert "低空经济" in block and "生物医药" in block
+
+
+def test_follow_up_chains_merge():
+    index = StorylineIndex()
+    index.add(_items(
+        "国务院印发《关于促进数据要素流通的若干意见》 - 新华网",
+        "解读：《关于促进数据要素流通的若干意见》三大看点 - 36氪",
+        "多地落实数据要素流通意见 首批交易所挂牌",
+        "成都发布人工智能产业建圈强链行动方案",
+        "解读成都人工智能产业建圈强链行动方案",
+        "成都人工智能产业建圈强链行动方案落地 首批项目签约",
+        "网信办公布第八批生成式AI服务备案",
+        "第八批生成式AI服务备案名单解读",
+    ))
+    assert _story_counts(index) == [2, 3, 3]
+
+
+def test_day_by_day_updates_with_interior_changes_merge():
+    pairs = [
+        ("2025成都AI大会今日开幕", "2025成都AI大会昨日闭幕"),
+        ("成都人工智能算力券申领今日开启", "成都人工智能算力券申领明日截止"),
+        ("国务院常务会议审议通过数据要素条例草案", "国务院常务会议正式公布数据要素条例全文"),
+        ("华为昇腾成都智算中心一期投运", "华为昇腾成都智算中心二期投运"),
+    ]
+    for first, update in pairs:
+        index = StorylineIndex()
+        index.add(_items(first, update))
+        assert len(index.stories) == 1, (first, update)
+
+
+def test_ties_go_to_the_oldest_story():
+    title = "成都人工智能算力券申领"
+    stories = {
+        sid: {
+            "first_ts": NOW, "last_ts": NOW, "count": 1, "first_title": title,
+            "latest_title": title, "source": "", "grams": sorted(title_grams(title)),
+        }
+        for sid in ("10", "2")
+    }
+    state = {"next_id": 11, "seen": {}, "stories": stories}
+    index = StorylineIndex(state)
+    index.add(_items("成都人工智能算力券申领指南"))
+    assert index.seen["成都人工智能算力券申领指南"] == "2"
+
+
+def test_block_only_counts_window_items():
+    old = StorylineIndex()
+    old.add(_items("国务院印发《关于促进数据要素流通的若干意见》", start_ts=NOW - 20 * DAY))
+    index = StorylineIndex(old.to_state())
+    index.add(_items(
+        "解读：《关于促进数据要素流通的若干意见》三大看点",
+        "多地落实数据要素流通意见 首批交易所挂牌",
+    ))
+    block = storyline_block("", index, cap=20)
+    assert "国务院印发" not in block
+    assert "2条" in block
+    assert "首见:" in block
+
+
+def test_common_grams_do_not_pull_candidates():
+    index = StorylineIndex()
+    index.add(_items(*(f"成都AI{name}" for name in (
+        "星河", "蓝鲸", "青松", "白鹭", "金沙", "锦江", "银杏", "岷山", "峨眉", "青城",
+    ))))
+    assert len(index.postings["成都"]) == 10
+    assert index._candidates(title_grams("成都AI星河项目投产")) == {"1"}
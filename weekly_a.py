@@ -1,9 +1,9 @@
 import os
 import time
 import datetime as dt
-import requests
 import feedparser
-from urllib.parse import urlparse
+import replay
+from storylines import build_storylines, storyline_block
 
 FEISHU_WEBHOOK = (os.environ.get("FEISHU_WEBHOOK_WEEKLY_A") or "").strip()
 DEEPSEEK_API_KEY = (os.environ.get("DEEPSEEK_API_KEY") or "").strip()
@@ -24,7 +24,7 @@ CONTINUE_MAX_ROUNDS = 6
 # -------------------------
 def _post_to_feishu_once(text: str):
     payload = {"msg_type": "text", "content": {"text": text}}
-    return requests.post(FEISHU_WEBHOOK, json=payload, timeout=25)
+    return replay.http_post(FEISHU_WEBHOOK, json=payload, timeout=25)
 
 def post_to_feishu(text: str):
     if not FEISHU_WEBHOOK:
@@ -35,7 +35,7 @@ def post_to_feishu(text: str):
         if 200 <= r.status_code < 300:
             return
         last = f"Feishu status={r.status_code}, body={r.text[:300]}"
-        time.sleep((2 ** i) * 1.1)
+        replay.sleep((2 ** i) * 1.1)
     raise RuntimeError(last or "Feishu post failed.")
 
 def split_into_chunks(text: str, max_len: int):
@@ -65,7 +65,7 @@ def post_to_feishu_in_chunks(text: str, max_len: int = FEISHU_MAX_LEN):
     for idx, c in enumerate(chunks, 1):
         header = "" if total == 1 else f"（第 {idx}/{total} 段）\n"
         post_to_feishu(header + c)
-        time.sleep(FEISHU_SLEEP_SEC)
+        replay.sleep(FEISHU_SLEEP_SEC)
 
 
 # -------------------------
@@ -73,7 +73,8 @@ def post_to_feishu_in_chunks(text: str, max_len: int = FEISHU_MAX_LEN):
 # -------------------------
 def read_feed(url: str, limit: int = 12):
     try:
-        d = feedparser.parse(url)
+        r = replay.http_get(url, timeout=20)
+        d = feedparser.parse(r.content)
         items = []
         for e in d.entries[:limit]:
             title = (e.get("title") or "").strip()
@@ -108,32 +109,6 @@ def filter_recent(items, max_age_seconds: int, now_ts: int):
             out.append(it)
     return out
 
-def fmt_ts(ts: int):
-    return dt.datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d")
-
-def domain_of(url: str):
-    try:
-        if not url:
-            return "unknown"
-        return urlparse(url).netloc or "unknown"
-    except:
-        return "unknown"
-
-def material_block(title: str, items, cap: int):
-    lines = [f""]
-    if not items:
-        lines.append("（近7天内无符合条件条目）")
-        return "\n".join(lines)
-
-    items = items[:cap]
-    for i, it in enumerate(items, 1):
-        pub = fmt_ts(it["published_ts"])
-        dom = domain_of(it.get("link", ""))
-        # 关键：不提供URL，避免模型产出链接占位符
-        lines.append(f"{i}. {it['title']} ｜来源:{dom}｜日期:{pub}")
-    return "\n".join(lines)
-
-
 # -------------------------
 # DeepSeek
 # -------------------------
@@ -147,7 +122,7 @@ def deepseek_chat(messages, max_tokens: int = 4200) -> str:
         "temperature": 0.2,
         "max_tokens": max_tokens,
     }
-    r = requests.post(DEEPSEEK_URL, headers=headers, json=payload, timeout=140)
+    r = replay.http_post(DEEPSEEK_URL, headers=headers, json=payload, timeout=140)
     print("DeepSeek status:", r.status_code)
     if r.status_code != 200:
         raise RuntimeError(f"DeepSeek failed: {r.status_code}, {r.text[:300]}")
@@ -178,7 +153,7 @@ def call_deepseek_weekly_a(material_text: str, today_str: str) -> str:
 
     messages = [
         {"role": "system", "content": system_rules},
-        {"role": "user", "content": f"【素材（仅标题/来源/日期）】\n{material_text}"},
+        {"role": "user", "content": f"【素材（仅标题/来源/日期；每行一条故事线，同一事件的多天进展已合并）】\n{material_text}"},
     ]
 
     out = deepseek_chat(messages, max_tokens=4200)
@@ -203,10 +178,10 @@ def call_deepseek_weekly_a(material_text: str, today_str: str) -> str:
 # Main
 # -------------------------
 def main():
-    now_ts = int(time.time())
+    now_ts = replay.now_ts()
     WEEK = 7 * 24 * 3600
 
-    beijing_now = dt.datetime.utcnow() + dt.timedelta(hours=8)
+    beijing_now = dt.datetime.utcfromtimestamp(now_ts) + dt.timedelta(hours=8)
     today_str = beijing_now.strftime("%Y-%m-%d")
     title = f"周报A｜经济&AI政策（北京 {beijing_now.strftime('%Y-%m-%d %H:%M')}）"
 
@@ -225,17 +200,21 @@ def main():
 
     econ_items, ai_items = [], []
     for u in econ_feeds:
-        econ_items.extend(read_feed(u, limit=14))
+        econ_items.extend(read_feed(u, limit=30))
     for u in ai_policy_feeds:
-        ai_items.extend(read_feed(u, limit=14))
+        ai_items.extend(read_feed(u, limit=30))
 
     econ_items = filter_recent(dedup(econ_items), WEEK, now_ts)
     ai_items = filter_recent(dedup(ai_items), WEEK, now_ts)
 
+    # 同一事件的多天进展合并成一条故事线，素材按故事线限量
+    econ_stories = build_storylines(econ_items, "weekly_a_econ", now_ts)
+    ai_stories = build_storylines(ai_items, "weekly_a_ai", now_ts)
+
     # 关键：为避免内容过长导致续写压力，先在素材层面限量
     material = "\n\n".join([
-        material_block("经济政策标题（全国｜近7天）", econ_items, cap=18),
-        material_block("AI政策标题（全国｜近7天）", ai_items, cap=18),
+        storyline_block("经济政策标题（全国｜近7天）", econ_stories, cap=18),
+        storyline_block("AI政策标题（全国｜近7天）", ai_stories, cap=18),
     ])
 
     try:
@@ -1,9 +1,9 @@
 import os
 import time
 import datetime as dt
-import requests
 import feedparser
-from urllib.parse import urlparse
+import replay
+from storylines import build_storylines, storyline_block
 
 FEISHU_WEBHOOK = (os.environ.get("FEISHU_WEBHOOK_WEEKLY_B") or "").strip()
 DEEPSEEK_API_KEY = (os.environ.get("DEEPSEEK_API_KEY") or "").strip()
@@ -20,7 +20,7 @@ CONTINUE_MAX_ROUNDS = 6
 
 def _post_to_feishu_once(text: str):
     payload = {"msg_type": "text", "content": {"text": text}}
-    return requests.post(FEISHU_WEBHOOK, json=payload, timeout=25)
+    return replay.http_post(FEISHU_WEBHOOK, json=payload, timeout=25)
 
 def post_to_feishu(text: str):
     if not FEISHU_WEBHOOK:
@@ -31,7 +31,7 @@ def post_to_feishu(text: str):
         if 200 <= r.status_code < 300:
             return
         last = f"Feishu status={r.status_code}, body={r.text[:300]}"
-        time.sleep((2 ** i) * 1.1)
+        replay.sleep((2 ** i) * 1.1)
     raise RuntimeError(last or "Feishu post failed.")
 
 def split_into_chunks(text: str, max_len: int):
@@ -61,12 +61,13 @@ def post_to_feishu_in_chunks(text: str, max_len: int = FEISHU_MAX_LEN):
     for idx, c in enumerate(chunks, 1):
         header = "" if total == 1 else f"（第 {idx}/{total} 段）\n"
         post_to_feishu(header + c)
-        time.sleep(FEISHU_SLEEP_SEC)
+        replay.sleep(FEISHU_SLEEP_SEC)
 
 
 def read_feed(url: str, limit: int = 12):
     try:
-        d = feedparser.parse(url)
+        r = replay.http_get(url, timeout=20)
+        d = feedparser.parse(r.content)
         items = []
         for e in d.entries[:limit]:
             title = (e.get("title") or "").strip()
@@ -101,30 +102,6 @@ def filter_recent(items, max_age_seconds: int, now_ts: int):
             out.append(it)
     return out
 
-def fmt_ts(ts: int):
-    return dt.datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d")
-
-def domain_of(url: str):
-    try:
-        if not url:
-            return "unknown"
-        return urlparse(url).netloc or "unknown"
-    except:
-        return "unknown"
-
-def material_block(title: str, items, cap: int):
-    lines = [f""]
-    if not items:
-        lines.append("（近7天内无符合条件条目）")
-        return "\n".join(lines)
-    items = items[:cap]
-    for i, it in enumerate(items, 1):
-        pub = fmt_ts(it["published_ts"])
-        dom = domain_of(it.get("link", ""))
-        lines.append(f"{i}. {it['title']} ｜来源:{dom}｜日期:{pub}")
-    return "\n".join(lines)
-
-
 def deepseek_chat(messages, max_tokens: int = 4200) -> str:
     if not DEEPSEEK_API_KEY:
         raise RuntimeError("Missing DEEPSEEK_API_KEY secret.")
@@ -135,7 +112,7 @@ def deepseek_chat(messages, max_tokens: int = 4200) -> str:
         "temperature": 0.2,
         "max_tokens": max_tokens,
     }
-    r = requests.post(DEEPSEEK_URL, headers=headers, json=payload, timeout=140)
+    r = replay.http_post(DEEPSEEK_URL, headers=headers, json=payload, timeout=140)
     print("DeepSeek status:", r.status_code)
     if r.status_code != 200:
         raise RuntimeError(f"DeepSeek failed: {r.status_code}, {r.text[:300]}")
@@ -166,7 +143,7 @@ def call_deepseek_weekly_b(material_text: str, today_str: str) -> str:
 
     messages = [
         {"role": "system", "content": system_rules},
-        {"role": "user", "content": f"【素材（仅标题/来源/日期）】\n{material_text}"},
+        {"role": "user", "content": f"【素材（仅标题/来源/日期；每行一条故事线，同一事件的多天进展已合并）】\n{material_text}"},
     ]
 
     out = deepseek_chat(messages, max_tokens=4200)
@@ -187,10 +164,10 @@ def call_deepseek_weekly_b(material_text: str, today_str: str) -> str:
 
 
 def main():
-    now_ts = int(time.time())
+    now_ts = replay.now_ts()
     WEEK = 7 * 24 * 3600
 
-    beijing_now = dt.datetime.utcnow() + dt.timedelta(hours=8)
+    beijing_now = dt.datetime.utcfromtimestamp(now_ts) + dt.timedelta(hours=8)
     today_str = beijing_now.strftime("%Y-%m-%d")
     title = f"周报B｜成都AI（北京 {beijing_now.strftime('%Y-%m-%d %H:%M')}）"
 
@@ -207,16 +184,19 @@ def main():
 
     policy_items, news_items = [], []
     for u in cd_policy_feeds:
-        policy_items.extend(read_feed(u, limit=14))
+        policy_items.extend(read_feed(u, limit=30))
     for u in cd_news_feeds:
-        news_items.extend(read_feed(u, limit=14))
+        news_items.extend(read_feed(u, limit=30))
 
     policy_items = filter_recent(dedup(policy_items), WEEK, now_ts)
     news_items = filter_recent(dedup(news_items), WEEK, now_ts)
 
+    policy_stories = build_storylines(policy_items, "weekly_b_policy", now_ts)
+    news_stories = build_storylines(news_items, "weekly_b_news", now_ts)
+
     material = "\n\n".join([
-        material_block("成都AI政策标题（近7天）", policy_items, cap=18),
-        material_block("成都AI动态标题（近7天）", news_items, cap=20),
+        storyline_block("成都AI政策标题（近7天）", policy_stories, cap=18),
+        storyline_block("成都AI动态标题（近7天）", news_stories, cap=20),
     ])
 
     try: